@@ -1,12 +1,17 @@
+import io
 import os
 import random
 import time
-from collections import deque
+from collections import deque, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from enum import Enum
 from pathlib import Path
-from typing import Optional, Annotated
+from typing import Optional, Annotated, Iterator
 
+import numpy as np
 import pygame
+from PIL import Image
+from pygame._sdl2.video import Window, Renderer, Texture
 from pgzero.ptext import getsurf as pgz_text
 from pydantic import Field, BeforeValidator
 from pydantic_settings import BaseSettings, SettingsConfigDict, CliApp
@@ -14,7 +19,29 @@ from watchfiles import watch, Change
 
 
 # Configuration
-ALLOWED_EXTENSIONS = [".jpg", ".jpeg", ".png", ".bmp", ".gif"]
+ALLOWED_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".bmp", ".gif"})
+# Formats that can be scaled down by the decoder itself
+JPEG_EXTENSIONS = frozenset({".jpg", ".jpeg"})
+# Frame rate while transitioning and while showing a still image
+FPS = 30
+IDLE_FPS = 5
+# Seconds between checks for added or removed images
+FILE_CHECK_INTERVAL = 10
+
+def find_images(root: str) -> Iterator[str]:
+    """Yield the paths of all images below root, walking the tree with scandir"""
+    directories = [root]
+    while directories:
+        directory = directories.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+                    elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in ALLOWED_EXTENSIONS:
+                        yield entry.path
+        except OSError as e:
+            print(f"Error scanning {directory}: {e}")
 
 class FillType(Enum):
     BLACK = "BLACK"
@@ -48,6 +75,7 @@ class Settings(BaseSettings):
     slideshow_mode: Annotated[SlideshowMode, BeforeValidator(Validators.to_upper)] = Field(SlideshowMode.RANDOM)
     transition_duration: Annotated[float, BeforeValidator(float)] = Field(2)
     slideshow_delay: Annotated[float, BeforeValidator(float)] = Field(10)
+    cache_size: Annotated[int, BeforeValidator(int)] = Field(8, ge=0)
 
 
 class PhotoFrame:
@@ -62,34 +90,66 @@ class PhotoFrame:
         self.screen_height = display_info.current_h
         print(f"Display resolution: {self.screen_width}x{self.screen_height}")
 
-        # Set the display fullscreen
-        self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-        pygame.display.set_caption("Photo Frame")
+        # Set the display fullscreen, images are drawn as textures by the GPU
+        self.window = Window("Photo Frame", size=(self.screen_width, self.screen_height), fullscreen=True)
+        self.renderer = Renderer(self.window, vsync=True)
+        self.renderer.logical_size = (self.screen_width, self.screen_height)
+        self.fullscreen = True
 
         self.font = pygame.font.Font(None, 36)
+        # Pause indicator, a "=" turned on its side
+        self.pause_glyph = Texture.from_surface(
+            self.renderer, pygame.transform.rotate(self.font.render("=", True, (255, 0, 0)), 90)
+        )
+        # Rendered filename overlays keyed by image path, cleared when the image changes
+        self.name_textures: dict[str, Texture] = {}
 
         # Initialize variables
         self.settings = settings
+        # The fill type is fixed for the run, so pick its implementation once
+        self.fill = {
+            FillType.BLACK: self.fill_black,
+            FillType.WHITE: self.fill_white,
+            FillType.TOP_PIXEL: self.fill_top_pixel,
+            FillType.SIDE_PIXEL: self.fill_side_pixel,
+            FillType.CLOSEST_BW: self.fill_closest_bw,
+        }[self.settings.fill_type]
 
         self.running = True
         self.images = []
+        self.index_of: dict[str, int] = {}
+        # Random mode shows the images in the order of this shuffled list of indices
+        self.order: list[int] = []
+        self.order_position = 0
         self.current_image_index = 0
+        # Path of the image on screen once the file watcher has removed it from the list
+        self.removed_current: Optional[str] = None
         self.next_image_index = 0
-        self.current_image: Optional[pygame.Surface] = None
-        self.next_image_surface: Optional[pygame.Surface] = None
-        self.last_change_time = time.time()
-        self.transition_start_time = 0
+        self.current_image: Optional[Texture] = None
+        self.next_image_texture: Optional[Texture] = None
+        self.last_change_time = time.monotonic()
+        # Alpha of the fading out image for each frame of the running transition
+        self.alpha_schedule: list[int] = []
+        self.transition_frame = 0
         self.is_transitioning = False
         self.paused = False
-        self.history = deque(maxlen=100)
-        self.file_timeout = 0
+        # Set whenever the screen needs redrawing outside of a transition
+        self.dirty = True
+        # (path, index) of previously shown images
+        self.history: deque[tuple[str, int]] = deque(maxlen=100)
+        # Recently displayed screen-sized surfaces keyed by image path
+        self.surface_cache: OrderedDict[str, pygame.Surface] = OrderedDict()
+        # Background decoding of the image the slideshow will show next
+        self.loader = ThreadPoolExecutor(max_workers=1)
+        self.preload: Optional[tuple[str, Future]] = None
+        self.next_file_check = 0.0
         self.file_watcher = watch(self.settings.image_directory, yield_on_timeout=True, rust_timeout=10)
         # Load images from the directory
         self.load_images()
 
         # Load initial image
         if self.images:
-            self.current_image = self.load_current_image()
+            self.current_image = self.load_texture(self.load_current_image())
 
     def load_images(self):
         """Find all image files in the specified directory"""
@@ -100,44 +160,112 @@ class PhotoFrame:
                 return
 
             # Get all files with allowed extensions
-            self.images = [
-                str(f)
-                for f in image_dir.rglob("*")
-                if f.is_file() and f.suffix.lower() in ALLOWED_EXTENSIONS
-            ]
+            self.images = list(find_images(self.settings.image_directory))
             print(f"Found {len(self.images)} images in {self.settings.image_directory}:")
-            if self.settings.slideshow_mode == SlideshowMode.RANDOM:
-                random.shuffle(self.images)
+            self.rebuild_index()
+            if self.settings.slideshow_mode == SlideshowMode.RANDOM and self.images:
+                self.shuffle_order()
+                self.current_image_index = self.order[0]
             if len(self.images) == 0:
                 print("No images found! Please check the directory and file types.")
         except Exception as e:
             print(f"Error loading images: {e}")
 
+    def rebuild_index(self):
+        """Rebuild the path to index lookup after the image list was reordered"""
+        self.index_of = {path: i for i, path in enumerate(self.images)}
+
+    def shuffle_order(self):
+        """Start a new random pass over all images, the image list itself keeps its order"""
+        self.order = list(range(len(self.images)))
+        random.shuffle(self.order)
+        self.order_position = 0
+
+    def add_image(self, image_path: str):
+        """Append an image to the slideshow"""
+        if image_path in self.index_of:
+            return
+        self.index_of[image_path] = len(self.images)
+        self.images.append(image_path)
+
+    def remove_image(self, image_path: str) -> bool:
+        """Remove an image from the slideshow by moving the last image into its slot"""
+        index = self.index_of.pop(image_path, None)
+        if index is None:
+            return False
+        last = self.images.pop()
+        moved_from = len(self.images)
+        if index == self.current_image_index:
+            # The image stays on screen until the next change, but its slot now belongs to another one
+            self.removed_current = image_path
+            self.current_image_index = min(index, max(moved_from - 1, 0))
+        if index != moved_from:
+            self.images[index] = last
+            self.index_of[last] = index
+            # Keep following the image that moved
+            if self.current_image_index == moved_from:
+                self.current_image_index = index
+            if self.next_image_index == moved_from:
+                self.next_image_index = index
+        self.surface_cache.pop(image_path, None)
+        return True
+
     def load_current_image(self, idx: Optional[int] = None) -> pygame.Surface:
-        """Load and scale the current image"""
+        """Load and scale the current image, reusing a cached surface if available"""
         if not self.images:
             raise ValueError("No images found")
 
+        index = self.current_image_index if idx is None else idx
         try:
-            image_path = self.images[idx or self.current_image_index]
+            image_path = self.images[index]
+        except IndexError:
+            print(f"Image index {index} out of range. Resetting to 0.")
+            self.current_image_index = 0
+            return self.load_current_image()
 
-            print(f"Loading image: {image_path}")
+        surface = self.surface_cache.get(image_path)
+        if surface is not None:
+            self.surface_cache.move_to_end(image_path)
+            return surface
 
-            # Load the image and get its dimensions
-            img = pygame.image.load(image_path)
-            img_width, img_height = img.get_size()
+        if self.preload is not None and self.preload[0] == image_path:
+            surface = self.preload[1].result()
+            self.preload = None
+        else:
+            surface = self.render_image(image_path)
+        if surface is not None:
+            self.surface_cache[image_path] = surface
+            if len(self.surface_cache) > self.settings.cache_size:
+                self.surface_cache.popitem(last=False)
+            return surface
+        return self.render_error_image(image_path)
+
+    def start_preload(self):
+        """Start decoding the upcoming image on the loader thread"""
+        next_index = self.peek_next_index()
+        if next_index is None:
+            return
+        image_path = self.images[next_index]
+        if image_path in self.surface_cache:
+            return
+        if self.preload is not None:
+            if self.preload[0] == image_path:
+                return
+            # The slideshow moved somewhere else, drop the stale preload
+            self.preload[1].cancel()
+        self.preload = (image_path, self.loader.submit(self.render_image, image_path))
+
+    def render_image(self, image_path: str) -> Optional[pygame.Surface]:
+        """Decode an image and fit it to the screen, returns None if it can't be loaded
 
-            # Calculate aspect ratio
-            img_aspect = img_width / img_height
-            screen_aspect = self.screen_width / self.screen_height
+        Runs on the loader thread as well, so it must not touch the screen or other shared state.
+        """
+        try:
+            print(f"Loading image: {image_path}")
 
-            # Scale the image to fit the screen while maintaining the aspect ratio
-            if img_aspect > screen_aspect:  # Image is wider
-                new_width = self.screen_width
-                new_height = int(new_width / img_aspect)
-            else:  # Image is taller
-                new_height = self.screen_height
-                new_width = int(new_height * img_aspect)
+            # Load the image and get its dimensions
+            img = self.decode_image(image_path)
+            new_width, new_height = self.fit_size(img.get_size())
 
             # Scale image
             scaled_img = pygame.transform.smoothscale(img, (new_width, new_height))
@@ -146,73 +274,127 @@ class PhotoFrame:
             pos_x = (self.screen_width - new_width) // 2
             pos_y = (self.screen_height - new_height) // 2
 
-            # Create the surface for the full screen with a black background
+            # Create the surface for the full screen, then fill the borders and place the image
             full_surface = pygame.Surface((self.screen_width, self.screen_height))
-
-            if self.settings.fill_type == FillType.BLACK:
-                full_surface.fill((0, 0, 0))
-            elif self.settings.fill_type == FillType.WHITE:
-                full_surface.fill((255, 255, 255))
-            elif self.settings.fill_type == FillType.TOP_PIXEL:
-                full_surface.fill(scaled_img.get_at((0, 0)))
-            elif self.settings.fill_type == FillType.SIDE_PIXEL:
-                for i in range(scaled_img.get_height()):
-                    low_line = scaled_img.get_at((0, i))
-                    full_surface.fill(low_line, (0, i, self.screen_width//2, 1))
-                    high_line = scaled_img.get_at((scaled_img.get_width() - 1, i))
-                    full_surface.fill(
-                        high_line,
-                        (self.screen_width // 2, i, self.screen_width // 2, 1),
-                    )
-            elif self.settings.fill_type == FillType.CLOSEST_BW:
-                pixel = scaled_img.get_at((0, 0))
-                avg = pixel[0] + pixel[1] + pixel[2] / 3
-                if avg < 128:
-                    full_surface.fill((0, 0, 0))
-                else:
-                    full_surface.fill((255, 255, 255))
-
-            # Blit the scaled image onto the center of the black surface
-            full_surface.blit(scaled_img, (pos_x, pos_y))
+            self.fill(full_surface, scaled_img, (pos_x, pos_y))
 
             return full_surface
-        except IndexError:
-            print(f"Image index {idx or self.current_image_index} out of range. Resetting to 0.")
-            self.current_image_index = 0
-            return self.load_current_image()
-
         except Exception as e:
-            print(f"Error loading image index {idx or self.current_image_index}: {self.images[idx or self.current_image_index]}: {e}")
-            # Create a blank image with an error message
-            error_image = pygame.Surface((self.screen_width, self.screen_height))
-            error_image.fill((0, 0, 0))
-            text = self.font.render(
-                f"Error loading image: {os.path.basename(self.images[idx or self.current_image_index])}",
-                True,
-                (255, 0, 0),
-            )
-            error_image.blit(
-                text,
-                (
-                    self.screen_width // 2 - text.get_width() // 2,
-                    self.screen_height // 2 - text.get_height() // 2,
-                ),
-            )
-            return error_image
+            print(f"Error loading image {image_path}: {e}")
+            return None
+
+    def fill_black(self, full_surface: pygame.Surface, scaled_img: pygame.Surface, pos: tuple[int, int]):
+        """Black borders"""
+        full_surface.fill((0, 0, 0))
+        full_surface.blit(scaled_img, pos)
+
+    def fill_white(self, full_surface: pygame.Surface, scaled_img: pygame.Surface, pos: tuple[int, int]):
+        """White borders"""
+        full_surface.fill((255, 255, 255))
+        full_surface.blit(scaled_img, pos)
+
+    def fill_top_pixel(self, full_surface: pygame.Surface, scaled_img: pygame.Surface, pos: tuple[int, int]):
+        """Borders in the colour of the image's top left pixel"""
+        full_surface.fill(scaled_img.get_at((0, 0)))
+        full_surface.blit(scaled_img, pos)
+
+    def fill_side_pixel(self, full_surface: pygame.Surface, scaled_img: pygame.Surface, pos: tuple[int, int]):
+        """Each row of the border repeats the image's outermost pixel on that side"""
+        # Stretch the outermost columns across each half of the screen and
+        # copy the image in directly, all through array views of the surfaces
+        pos_x, pos_y = pos
+        src = pygame.surfarray.pixels3d(scaled_img)
+        full_arr = pygame.surfarray.pixels3d(full_surface)
+        half_width = self.screen_width // 2
+        rows = slice(pos_y, pos_y + src.shape[1])
+        full_arr[:half_width, rows] = src[0][np.newaxis]
+        full_arr[half_width:, rows] = src[-1][np.newaxis]
+        full_arr[pos_x:pos_x + src.shape[0], rows] = src
+        # Release the views so the surfaces are unlocked again
+        del src, full_arr
+
+    def fill_closest_bw(self, full_surface: pygame.Surface, scaled_img: pygame.Surface, pos: tuple[int, int]):
+        """Black or white borders, whichever is closer to the image's average brightness"""
+        # Average brightness over the whole image
+        avg = pygame.surfarray.pixels3d(scaled_img).mean()
+        if avg < 128:
+            full_surface.fill((0, 0, 0))
+        else:
+            full_surface.fill((255, 255, 255))
+        full_surface.blit(scaled_img, pos)
+
+    def decode_image(self, image_path: str) -> pygame.Surface:
+        """Decode an image file, JPEGs are reduced towards the displayed size while decoding"""
+        # Read the whole file up front so the decoder works from memory rather than
+        # interleaving small reads from slow storage with decoding
+        with open(image_path, "rb") as f:
+            data = io.BytesIO(f.read())
+
+        if os.path.splitext(image_path)[1].lower() not in JPEG_EXTENSIONS:
+            # The path gives SDL_image the extension hint
+            return pygame.image.load(data, image_path)
+
+        with Image.open(data) as im:
+            # libjpeg picks the largest 1/2, 1/4 or 1/8 reduction that still covers the requested size
+            im.draft("RGB", self.fit_size(im.size))
+            im = im.convert("RGB")
+        return pygame.image.frombytes(im.tobytes(), im.size, "RGB")
+
+    def fit_size(self, size: tuple[int, int]) -> tuple[int, int]:
+        """Size that fits an image on the screen while maintaining the aspect ratio"""
+        img_width, img_height = size
+
+        # Calculate aspect ratio
+        img_aspect = img_width / img_height
+        screen_aspect = self.screen_width / self.screen_height
+
+        if img_aspect > screen_aspect:  # Image is wider
+            new_width = self.screen_width
+            new_height = int(new_width / img_aspect)
+        else:  # Image is taller
+            new_height = self.screen_height
+            new_width = int(new_height * img_aspect)
+        return new_width, new_height
+
+    def render_error_image(self, image_path: str) -> pygame.Surface:
+        """Create a blank image with an error message"""
+        error_image = pygame.Surface((self.screen_width, self.screen_height))
+        error_image.fill((0, 0, 0))
+        text = self.font.render(
+            f"Error loading image: {os.path.basename(image_path)}",
+            True,
+            (255, 0, 0),
+        )
+        error_image.blit(
+            text,
+            (
+                self.screen_width // 2 - text.get_width() // 2,
+                self.screen_height // 2 - text.get_height() // 2,
+            ),
+        )
+        return error_image
+
+    def load_texture(self, surface: pygame.Surface) -> Texture:
+        """Upload a prepared image to the GPU, set up to be faded by its alpha"""
+        texture = Texture.from_surface(self.renderer, surface)
+        texture.blend_mode = pygame.BLENDMODE_BLEND
+        return texture
 
     def start_transition_to(self, index):
         """Start transition to a new image"""
-        if index == self.current_image_index or not self.images:
+        if (index == self.current_image_index and self.removed_current is None) or not self.images:
             return
 
         # Save the current image for transition
         self.next_image_index = index
 
         # Load the next image
-        self.next_image_surface = self.load_current_image(self.next_image_index)
+        self.next_image_texture = self.load_texture(self.load_current_image(self.next_image_index))
 
-        # Start transition
-        self.transition_start_time = time.time()
+        # Start transition, precomputing the alpha for every frame
+        frames = max(1, round(self.settings.transition_duration * FPS))
+        self.alpha_schedule = [255 * (frames - i) // frames for i in range(frames + 1)]
+        self.transition_frame = 0
         self.is_transitioning = True
 
     def update_transition(self):
@@ -220,50 +402,68 @@ class PhotoFrame:
         if not self.is_transitioning:
             return
 
-        # Calculate transition progress (0.0 to 1.0)
-        elapsed = time.time() - self.transition_start_time
-        progress = min(elapsed / self.settings.transition_duration, 1.0)
-
-        if progress >= 1.0:
+        if self.transition_frame >= len(self.alpha_schedule):
             # Transition complete
             self.current_image_index = self.next_image_index
-            self.current_image = self.next_image_surface
-            self.next_image_surface = None
+            self.removed_current = None
+            self.current_image = self.next_image_texture
+            self.current_image.alpha = 255
+            self.next_image_texture = None
             self.is_transitioning = False
+            self.name_textures.clear()
+            self.dirty = True
             return
 
-        # Create a blended image for the transition
-        temp_surface = self.current_image.copy()
-        temp_surface.set_alpha(int(255 * (1 - progress)))
+        # Let the GPU blend the fading current image over the next one
+        self.current_image.alpha = self.alpha_schedule[self.transition_frame]
+        self.transition_frame += 1
+        self.next_image_texture.draw()
+        self.current_image.draw()
 
-        # Draw the next image and overlay the fading current image
-        self.screen.blit(self.next_image_surface, (0, 0))
-        self.screen.blit(temp_surface, (0, 0))
+    def peek_next_index(self) -> Optional[int]:
+        """Index the slideshow advances to next, None if it isn't known until the order is reshuffled"""
+        if not self.images:
+            return None
+        if self.settings.slideshow_mode == SlideshowMode.RANDOM:
+            position = self.order_position + 1
+            if position >= len(self.order):
+                return None
+            return self.order[position]
+        return (self.current_image_index + 1) % len(self.images)
 
-    def next_image(self):
+    def next_image(self, now: float):
         """Switch to the next image"""
-        self.history.append(self.images[self.current_image_index])
         if not self.images:
             return
+        if self.removed_current is None:
+            self.history.append((self.images[self.current_image_index], self.current_image_index))
+        next_index = self.peek_next_index()
         if self.settings.slideshow_mode == SlideshowMode.RANDOM:
-            next_index = self.current_image_index + 1
-            if next_index >= len(self.images):
-                random.shuffle(self.images)
-                next_index = 0
-        else:
-            next_index = (self.current_image_index + 1) % len(self.images)
+            self.order_position += 1
+            if next_index is None:
+                # Every image has been shown, start a new pass without repeating the current one
+                self.shuffle_order()
+                if len(self.order) > 1 and self.order[0] == self.current_image_index:
+                    self.order[0], self.order[-1] = self.order[-1], self.order[0]
+                next_index = self.order[0]
         self.start_transition_to(next_index)
-        self.last_change_time = time.time()
+        self.last_change_time = now
 
-    def previous_image(self):
+    def previous_image(self, now: float):
         """Switch to the previous image"""
         if not self.images:
             return
-        if len(self.history) > 0:
-            self.start_transition_to(self.images.index(self.history.pop()))
-        self.last_change_time = time.time()
-
-    def random_image(self):
+        while self.history:
+            image_path, index = self.history.pop()
+            # The list may have been changed by the file watcher since
+            if index >= len(self.images) or self.images[index] != image_path:
+                index = self.index_of.get(image_path)
+            if index is not None:
+                self.start_transition_to(index)
+                break
+        self.last_change_time = now
+
+    def random_image(self, now: float):
         """Switch to a random image"""
         if len(self.images) <= 1:
             return
@@ -271,18 +471,19 @@ class PhotoFrame:
         while next_index == self.current_image_index:
             next_index = random.randint(0, len(self.images) - 1)
         self.start_transition_to(next_index)
-        self.last_change_time = time.time()
+        self.last_change_time = now
 
-    def toggle_pause(self):
+    def toggle_pause(self, now: float):
         """Toggle slideshow pause state"""
         self.paused = not self.paused
+        self.dirty = True
         if self.paused:
             print("Slideshow paused")
         else:
             print("Slideshow resumed")
-            self.last_change_time = time.time()  # Reset timer when unpaused
+            self.last_change_time = now  # Reset timer when unpaused
 
-    def handle_events(self):
+    def handle_events(self, now: float):
         """Handle user input events"""
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -293,16 +494,25 @@ class PhotoFrame:
                 if event.key == pygame.K_ESCAPE:
                     self.running = False
                 elif event.key == pygame.K_RIGHT or event.key == pygame.K_DOWN:
-                    self.next_image()
+                    self.next_image(now)
                 elif event.key == pygame.K_LEFT or event.key == pygame.K_UP:
-                    self.previous_image()
+                    self.previous_image(now)
                 elif event.key == pygame.K_SPACE:
-                    self.toggle_pause()
+                    self.toggle_pause(now)
                 elif event.key == pygame.K_r:
-                    self.random_image()
+                    self.random_image(now)
                 elif event.key == pygame.K_f:
                     # Toggle fullscreen
-                    pygame.display.toggle_fullscreen()
+                    if self.fullscreen:
+                        self.window.set_windowed()
+                    else:
+                        self.window.set_fullscreen()
+                    self.fullscreen = not self.fullscreen
+                    self.dirty = True
+
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.VIDEORESIZE, pygame.WINDOWEXPOSED):
+                # The window contents were lost or resized
+                self.dirty = True
 
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 # Mouse controls
@@ -310,66 +520,103 @@ class PhotoFrame:
                 if event.button == 1:  # Left click
                     x = event.pos[0]
                     if x < self.screen_width // 3:
-                        self.previous_image()
+                        self.previous_image(now)
                     elif x > (self.screen_width * 2) // 3:
-                        self.next_image()
+                        self.next_image(now)
                     else:
-                        self.toggle_pause()
-        self.file_timeout -= 1
-        if self.file_timeout < 0:
-            self.file_timeout = 300
-            while changes:=next(self.file_watcher):
-                for action, file_path  in changes:
-                    match action:
-                        case Change.added:
-                            tmp_path = Path(file_path)
-                            if tmp_path.is_file():
-                                if tmp_path.suffix in ALLOWED_EXTENSIONS:
-                                    self.images.append(file_path)
-                                    print(f"Image added: {tmp_path}")
-                        case Change.deleted:
-                            self.images.remove(file_path)
-                            print(f"Image removed: {file_path}")
-                        case _:
-                            pass
-
-    def update(self):
+                        self.toggle_pause(now)
+        if now >= self.next_file_check:
+            self.next_file_check = now + FILE_CHECK_INTERVAL
+            # Take a single batch per check so a burst of changes can't hold up the display
+            changes = next(self.file_watcher, None)
+            if changes:
+                self.apply_file_changes(changes)
+
+    def apply_file_changes(self, changes: set[tuple[Change, str]]):
+        """Apply a batch of file watcher changes to the image list"""
+        # A batch is unordered, so check the filesystem for paths that were added and removed again
+        added = []
+        removed = []
+        for action, file_path in changes:
+            match action:
+                case Change.added:
+                    if os.path.isdir(file_path):
+                        # A directory moved in only reports itself
+                        added.extend(find_images(file_path))
+                    elif os.path.isfile(file_path) and os.path.splitext(file_path)[1].lower() in ALLOWED_EXTENSIONS:
+                        added.append(file_path)
+                case Change.deleted:
+                    if not os.path.exists(file_path):
+                        removed.append(file_path)
+                case _:
+                    pass
+
+        # Indices move when images are removed, so remember the rest of this random pass by path
+        upcoming = [self.images[i] for i in self.order[self.order_position + 1:]]
+
+        removed_count = sum(self.remove_image(file_path) for file_path in removed)
+        added_count = len(self.images)
+        for file_path in added:
+            self.add_image(file_path)
+        added_count = len(self.images) - added_count
+        if added_count or removed_count:
+            print(f"Images added: {added_count}, removed: {removed_count}")
+            if self.settings.slideshow_mode == SlideshowMode.RANDOM:
+                # Mix new images into the rest of the pass, a full reshuffle waits until it wraps
+                upcoming = [self.index_of[path] for path in dict.fromkeys(upcoming + added) if path in self.index_of]
+                random.shuffle(upcoming)
+                self.order = [self.current_image_index] + upcoming
+                self.order_position = 0
+
+    def filename_texture(self) -> Texture:
+        """Filename overlay for the current image, rendered once per image"""
+        image_path = self.removed_current or self.images[self.current_image_index]
+        text = self.name_textures.get(image_path)
+        if text is None:
+            text = Texture.from_surface(
+                self.renderer,
+                pgz_text(f"{image_path.replace(self.settings.image_directory, '')}", owidth=1, ocolor="black", color="white", fontsize=36),
+            )
+            self.name_textures[image_path] = text
+        return text
+
+    def update(self, now: float):
         """Update the display based on time and transitions"""
-        current_time = time.time()
 
         # Check if it's time to change images automatically (if not paused)
         if (
             not self.paused
             and not self.is_transitioning
-            and current_time - self.last_change_time > self.settings.slideshow_delay
+            and now - self.last_change_time > self.settings.slideshow_delay
         ):
-            self.next_image()
+            self.next_image(now)
 
+        # Get the upcoming image ready while the current one is on screen
+        if not self.is_transitioning:
+            self.start_preload()
 
         # Update transition if in progress
         if self.is_transitioning:
             self.update_transition()
-        else:
-            # Just draw the current image
-            self.screen.blit(self.current_image, (0, 0))
+
+        if self.is_transitioning:
+            self.renderer.present()
+        elif self.dirty:
+            # Just draw the current image, this also runs once when a transition finishes
+            self.current_image.draw()
             if self.paused:
-                text = self.font.render(
-                    f"=",
-                    True,
-                    (255, 0, 0),
-                )
-                text = pygame.transform.rotate(text, 90)
-                self.screen.blit(text, (10, 10))
-                text = pgz_text(f"{self.images[self.current_image_index].replace(self.settings.image_directory, '')}", owidth=1, ocolor="black", color="white", fontsize=36)
-                self.screen.blit(text, (self.screen_width//2 - text.get_width()//2 , self.screen_height - text.get_height() - 10))
-        pygame.display.flip()
+                self.pause_glyph.draw(dstrect=(10, 10))
+                text = self.filename_texture()
+                text.draw(dstrect=(self.screen_width//2 - text.width//2 , self.screen_height - text.height - 10))
+            self.renderer.present()
+            self.dirty = False
 
     def run(self):
         """Main program loop"""
         # First draw
         if self.current_image:
-            self.screen.blit(self.current_image, (0, 0))
-            pygame.display.flip()
+            self.current_image.draw()
+            self.renderer.present()
 
         print("Photo Frame started. Controls:")
         print("  - Left/Right arrows or mouse clicks: Previous/Next image")
@@ -381,9 +628,13 @@ class PhotoFrame:
         clock = pygame.time.Clock()
         # try:
         while self.running:
-            self.handle_events()
-            self.update()
-            clock.tick(30)  # Limit to 30 FPS to save resources
+            # One clock read per frame, monotonic so wall clock adjustments don't skip or stall the slideshow
+            now = time.monotonic()
+            self.handle_events(now)
+            self.update(now)
+            # Only run at full rate while something is moving on screen
+            clock.tick(FPS if self.is_transitioning else IDLE_FPS)
+        self.loader.shutdown(wait=False, cancel_futures=True)
         # except Exception as e:
         #     print(f"Error in main loop: {e}")
         # finally:
@@ -1,15 +1,49 @@
+import errno
+import fnmatch
+import json
+import os
+import re
+import shutil
+import sqlite3
+import zipfile
 from asyncio import QueueShutDown
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import PurePosixPath, Path
-from typing import Annotated, Any, Awaitable
+from typing import Annotated, Any, Callable, Optional
+from urllib.parse import quote
 
 import aiodav.exceptions
-from pydantic import BeforeValidator, Field
+import aiofiles
+import aiofiles.os
+import aiohttp
+from pydantic import BeforeValidator, Field, PrivateAttr
 from aiodav import Client
 from pydantic_settings import BaseSettings, SettingsConfigDict, CliApp, YamlConfigSettingsSource, \
     PydanticBaseSettingsSource
 import asyncio
 from loguru import logger
 from tempfile import TemporaryFile
+
+# Read and write downloads in 1 MiB pieces to keep the syscall count per file low
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+# Remote etags of finished downloads and fully synced directories, kept in the destination
+MANIFEST_NAME = ".pyframe_cache.db"
+# Older SQLite builds cap a statement at 999 parameters
+MANIFEST_BATCH = 500
+# Give up on a response that goes quiet for this long, however long the whole body takes
+READ_TIMEOUT = 60
+# Unauthorised and out of quota, retrying other files will not help. Nextcloud also answers 403 for
+# single files (shares without download permission, access control rules), so that only skips the file
+FATAL_STATUS_CODES = frozenset({401, 507})
+
+GLOB_CHARACTERS = frozenset("*?[")
+
+# Remote path, local destination, remote etag and the byte offset to resume from
+Download = tuple[str, str, Optional[str], int]
+
 class Validators:
     @staticmethod
     def lowercase_list(value: list[str]) -> list:
@@ -21,11 +55,60 @@ class WebdavSettings(BaseSettings):
     password: str
     target_dirs: list[PurePosixPath]
     workers: int = 10
+    # PROPFIND listings allowed in flight at once, defaults to workers
+    list_workers: Optional[int] = Field(None, ge=1)
+    # Fetch a directory's small files as one zip once it has this many of them, 0 turns it off
+    bulk_min_files: int = Field(0, ge=0)
+    bulk_max_file_size: int = Field(1 << 20, ge=0)
+
+@dataclass(slots=True, frozen=True)
+class CompiledFilters:
+    """The filter lists compiled for lookups, kept out of pydantic for cheap attribute access per entry."""
+    files: frozenset[str]
+    folders: frozenset[str]
+    files_glob: Optional[re.Pattern]
+    folders_glob: Optional[re.Pattern]
+    contains: Optional[re.Pattern]
+
+    def ignores_folder(self, name: str) -> bool:
+        if name in self.folders:
+            return True
+        return self.folders_glob is not None and self.folders_glob.match(name) is not None
+
+    def ignores_file(self, name: str) -> bool:
+        if name in self.files:
+            return True
+        if self.files_glob is not None and self.files_glob.match(name) is not None:
+            return True
+        return self.contains is not None and self.contains.search(name) is not None
 
 class FilterSettings(BaseSettings):
     ignore_files: Annotated[list, BeforeValidator(Validators.lowercase_list)] = Field(default_factory=list)
     ignore_files_contains: Annotated[list, BeforeValidator(Validators.lowercase_list)] = Field(default_factory=list)
     ignore_folders: Annotated[list, BeforeValidator(Validators.lowercase_list)] = Field(default_factory=list)
+    _compiled: CompiledFilters = PrivateAttr()
+
+    def model_post_init(self, context: Any) -> None:
+        # Compile the lists once so each check is a set lookup and at most two regex scans
+        files, files_glob = self.compile_names(self.ignore_files)
+        folders, folders_glob = self.compile_names(self.ignore_folders)
+        contains = None
+        if self.ignore_files_contains:
+            contains = re.compile("|".join(map(re.escape, self.ignore_files_contains)))
+        self._compiled = CompiledFilters(files, folders, files_glob, folders_glob, contains)
+
+    @property
+    def compiled(self) -> CompiledFilters:
+        return self._compiled
+
+    @staticmethod
+    def compile_names(names: list[str]) -> tuple[frozenset[str], Optional[re.Pattern]]:
+        # Plain names go in a set, glob patterns like *.tmp share one alternation regex
+        globs = [name for name in names if GLOB_CHARACTERS.intersection(name)]
+        exact = frozenset(name for name in names if not GLOB_CHARACTERS.intersection(name))
+        if not globs:
+            return exact, None
+        return exact, re.compile("|".join(map(fnmatch.translate, globs)))
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
@@ -33,6 +116,9 @@ class Settings(BaseSettings):
     )
     webdav: WebdavSettings
     destination: Path = Field(default_factory=Path)
+    # Manifest of synced etags, defaults to .pyframe_cache.db in the destination.
+    # Point it at a local disk when the destination is a network share
+    manifest: Optional[Path] = None
     filters: FilterSettings
 
     @classmethod
@@ -46,93 +132,426 @@ class Settings(BaseSettings):
     ) -> tuple[PydanticBaseSettingsSource, ...]:
         return (YamlConfigSettingsSource(settings_cls),)
 
+class DownloadQueue:
+    """Bounded FIFO of downloads on a deque, waking waiters only when it goes empty/non-empty or full/not-full."""
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.items: deque[Download] = deque()
+        self.unfinished = 0
+        self.closed = False
+        self.has_items = asyncio.Event()
+        self.has_space = asyncio.Event()
+        self.has_space.set()
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    async def put(self, item: Download) -> None:
+        while len(self.items) >= self.maxsize:
+            self.has_space.clear()
+            await self.has_space.wait()
+        self.items.append(item)
+        self.unfinished += 1
+        self.idle.clear()
+        self.has_items.set()
+
+    async def get(self) -> Download:
+        while not self.items:
+            if self.closed:
+                raise QueueShutDown
+            self.has_items.clear()
+            await self.has_items.wait()
+        item = self.items.popleft()
+        self.has_space.set()
+        return item
+
+    def task_done(self) -> None:
+        self.unfinished -= 1
+        if not self.unfinished:
+            self.idle.set()
+
+    async def join(self) -> None:
+        await self.idle.wait()
+
+    def shutdown(self) -> None:
+        # Wake idle workers so they see the queue is closed
+        self.closed = True
+        self.has_items.set()
+
 class NextcloudDownloader:
     def __init__(self, settings: Settings):
         self.settings = settings
         self.client: Client = None
-        self.queue: asyncio.Queue = asyncio.Queue()
+        # Plain session on the client's connector for requests aiodav has no call for
+        self.session: aiohttp.ClientSession = None
+        # Bounded so listings wait for the workers instead of queueing the whole tree
+        self.queue = DownloadQueue(maxsize=settings.webdav.workers * 4)
+        # Caps the number of PROPFIND listings in flight across the whole tree, apart from the download workers
+        self.list_semaphore = asyncio.Semaphore(settings.webdav.list_workers or settings.webdav.workers)
+        # Directory listings started but not yet awaited
+        self.listing_tasks: list[asyncio.Task] = []
+        self.task_group: asyncio.TaskGroup = None
+        self.filters = settings.filters.compiled
         self.prefix = PurePosixPath(f"/remote.php/dav/files/{settings.webdav.username}")
+        # Names like thumbs.db repeat all over a tree, so remember each decision
+        self.name_allowed = lru_cache(maxsize=4096)(self.name_allowed)
+        self.manifest: sqlite3.Connection = None
+        # Every manifest query runs on this one thread, in order and off the event loop
+        self.manifest_executor = ThreadPoolExecutor(max_workers=1)
+        # Directory etags seen this run, only saved once the whole run succeeded
+        self.seen_directories: dict[str, str] = {}
+        self.complete = True
 
     @logger.catch
     async def run(self):
-        worker_tasks = []
-        for _ in range(self.settings.webdav.workers):
-            task = asyncio.create_task(self.download_worker())
-            worker_tasks.append(task)
+        # One keep-alive connection pool shared by every listing and download, with room for both at once
+        connections = self.settings.webdav.workers + (self.settings.webdav.list_workers or self.settings.webdav.workers)
+        connector = aiohttp.TCPConnector(
+            limit=connections,
+            limit_per_host=connections,
+            keepalive_timeout=60,
+            force_close=False,
+            enable_cleanup_closed=True,
+        )
+        self.client = Client(
+            self.settings.webdav.host,
+            login=self.settings.webdav.username,
+            password=self.settings.webdav.password,
+            chunk_size=DOWNLOAD_CHUNK_SIZE,
+            connector=connector,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            connector_owner=False,
+            # Zips and resumed files can be large, so only time out reads that stall
+            timeout=aiohttp.ClientTimeout(total=None, sock_read=READ_TIMEOUT),
+            auth=aiohttp.BasicAuth(self.settings.webdav.username, self.settings.webdav.password),
+        )
 
+        await aiofiles.os.makedirs(self.settings.destination, exist_ok=True)
+        await self.in_manifest(self.open_manifest)
+        try:
+            await self.check_access()
+            # A fatal error in any worker or listing cancels everything else in the group
+            async with asyncio.TaskGroup() as self.task_group:
+                for _ in range(self.settings.webdav.workers):
+                    self.task_group.create_task(self.download_worker())
+                for directory in self.settings.webdav.target_dirs:
+                    self.start_listing(str(PurePosixPath(self.prefix, directory)), self.settings.destination)
+                # Listings start more listings as they find subdirectories, wait until none are left
+                while self.listing_tasks:
+                    tasks, self.listing_tasks = self.listing_tasks, []
+                    await asyncio.gather(*tasks)
+                await self.queue.join()
+                self.queue.shutdown()
+        except BaseException:
+            # Cancelled or failed part way, the directory etags cannot be trusted
+            self.complete = False
+            raise
+        finally:
+            await self.session.close()
+            await self.client.close()
+            await self.in_manifest(self.close_manifest)
+            self.manifest_executor.shutdown()
 
-        self.client = Client(self.settings.webdav.host, login=self.settings.webdav.username, password=self.settings.webdav.password)
-        for directory in self.settings.webdav.target_dirs:
-            await self.process_directory(PurePosixPath(self.prefix, directory), self.settings.destination)
-        await self.queue.join()
-        self.queue.shutdown()
-        await self.client.close()
+    async def check_access(self) -> None:
+        # aiodav's list turns a 401 into RemoteResourceNotFound, so test the credentials once up front.
+        # Any error here, a 403 on the user's root included, stops the run before it starts
+        url = f"{self.settings.webdav.host.rstrip('/')}{quote(str(self.prefix))}/"
+        async with self.session.request("PROPFIND", url, headers={"Depth": "0"}) as response:
+            response.raise_for_status()
+
+    async def in_manifest(self, func: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.manifest_executor, func, *args)
+
+    def open_manifest(self) -> None:
+        self.manifest = sqlite3.connect(self.settings.manifest or Path(self.settings.destination, MANIFEST_NAME))
+        self.manifest.execute(
+            "CREATE TABLE IF NOT EXISTS manifest "
+            "(remote_path TEXT PRIMARY KEY, etag TEXT, mtime INTEGER, local_size INTEGER)"
+        )
+
+    def close_manifest(self) -> None:
+        # A directory's etag changes whenever anything below it does, but it can only be
+        # trusted to skip the subtree if everything below it actually made it to disk
+        if self.complete:
+            self.manifest.executemany(
+                "INSERT OR REPLACE INTO manifest (remote_path, etag) VALUES (?, ?)",
+                self.seen_directories.items(),
+            )
+        else:
+            logger.warning("Some listings or downloads failed, directory manifest not updated")
+        self.manifest.commit()
+        self.manifest.close()
+
+    def manifest_entries(self, remote_paths: list[str]) -> dict[str, tuple[Optional[str], Optional[int]]]:
+        entries = {}
+        for start in range(0, len(remote_paths), MANIFEST_BATCH):
+            batch = remote_paths[start:start + MANIFEST_BATCH]
+            rows = self.manifest.execute(
+                f"SELECT remote_path, etag, local_size FROM manifest WHERE remote_path IN ({','.join('?' * len(batch))})",
+                batch,
+            )
+            entries.update((remote_path, (etag, local_size)) for remote_path, etag, local_size in rows)
+        return entries
+
+    def record_started(self, source: str, etag: Optional[str]) -> None:
+        # No local size marks the bytes on disk as a partial copy of this etag, committed
+        # straight away so a killed run can still resume from it
+        self.manifest.execute("INSERT OR REPLACE INTO manifest VALUES (?, ?, NULL, NULL)", (source, etag))
+        self.manifest.commit()
+
+    def store_downloads(self, rows: list[tuple[str, Optional[str], int, int]]) -> None:
+        self.manifest.executemany("INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?)", rows)
+
+    async def record_download(self, source: str, destination: str, etag: Optional[str]) -> None:
+        stat = await aiofiles.os.stat(destination)
+        await self.in_manifest(self.store_downloads, [(source, etag, int(stat.st_mtime), stat.st_size)])
 
-    @logger.catch
     async def download_worker(self):
         logger.debug(f"Starting download worker")
-        destination = None
+        while True:
+            try:
+                source, destination, etag, offset = await self.queue.get()
+            except QueueShutDown:
+                logger.debug("Worker ShutDown")
+                return
+            try:
+                if offset:
+                    await self.resume_file(source, destination, etag, offset)
+                else:
+                    await self.in_manifest(self.record_started, source, etag)
+                    await self.stream_file(source, destination)
+                await self.record_download(source, destination, etag)
+                logger.info(f"Finished downloading {destination}")
+            except Exception as e:
+                # Only errors no other file can get past stop the run, everything else skips this file
+                self.complete = False
+                if self.is_fatal(e):
+                    Path(destination).unlink(missing_ok=True)
+                    logger.error(f"Fatal error while downloading {source}, stopping: {e!r}")
+                    raise
+                # The bytes received so far stay on disk, check_present resumes them next run
+                logger.error(f"Error while downloading {source}: {e!r}")
+            self.queue.task_done()
+
+    @staticmethod
+    def is_fatal(error: Exception) -> bool:
+        if isinstance(error, aiodav.exceptions.NotEnoughSpace):
+            return True
+        if isinstance(error, OSError) and error.errno == errno.ENOSPC:
+            return True
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status in FATAL_STATUS_CODES
+        return getattr(error, "code", None) in FATAL_STATUS_CODES
+
+    async def stream_file(self, source: str, destination: str) -> None:
+        async with aiofiles.open(destination, "wb", buffering=DOWNLOAD_CHUNK_SIZE) as f:
+            # download_iter is a coroutine returning the response's chunk iterator, sized by the client
+            async for chunk in await self.client.download_iter(source):
+                await f.write(chunk)
+
+    async def resume_file(self, source: str, destination: str, etag: Optional[str], offset: int) -> None:
+        # Only queued when the partial bytes are known to come from this etag, and the server
+        # only honours the range if the file is still unchanged, otherwise it sends it all
+        headers = {"Range": f"bytes={offset}-", "If-Range": etag if etag.startswith('"') else f'"{etag}"'}
+        url = f"{self.settings.webdav.host.rstrip('/')}{quote(source)}"
+        async with self.session.get(url, headers=headers) as response:
+            response.raise_for_status()
+            if response.status == 206:
+                logger.info(f"Resuming {destination} from {offset} bytes")
+                mode = "ab"
+            else:
+                mode = "wb"
+            async with aiofiles.open(destination, mode, buffering=DOWNLOAD_CHUNK_SIZE) as f:
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    await f.write(chunk)
+
+    async def process_directory(self, source: str, destination: Path, etag: Optional[str] = None) -> None:
         try:
-            while True:
-                try:
-                    source, destination = await self.queue.get()
-                    await self.client.download_file(source, destination)
-                    logger.info(f"Finished downloading {destination}")
-                    destination = None
-                    self.queue.task_done()
-                except aiodav.exceptions.WebDavException as e:
-                    if destination:
-                        Path(destination).unlink()
-                    logger.error(f"Error while downloading file: {e}")
-                    self.queue.task_done()
-        except QueueShutDown:
-            logger.debug("Worker ShutDown")
+            await self.sync_directory(source, destination)
+        except Exception as e:
+            # Something below here was left unsynced, so no directory etag can be trusted this run
+            self.complete = False
+            if self.is_fatal(e):
+                logger.error(f"Fatal error while listing {source}, stopping: {e!r}")
+                raise
+            logger.exception(f"Error while processing directory {source}")
             return
+        # Only remembered once this directory itself went through, close_manifest still needs the rest
+        if etag:
+            self.seen_directories[source] = etag
 
-    @logger.catch
-    async def process_directory(self, source: PurePosixPath, destination: Path) -> None:
-        logger.debug(f"Checking destination {destination}")
-        if not destination.exists():
-            destination.mkdir()
-        logger.debug(f"Processing directory: {source}")
-        work_items = []
-        directory_list = await self.client.list(str(source), get_info=True)
-        for item in directory_list:
-            item_path = PurePosixPath(item["path"])
-            if self.item_filtered(item,  item_path):
-                if item['isdir']:
-                    logger.info(f"Directory {item['path']}")
-                    work_items.append(
-                        self.log_awaitable_finish(self.process_directory(item_path, Path(destination, item_path.name)), f"Finished processing directory {item_path}")
-                    )
+    async def sync_directory(self, source: str, destination: Path) -> None:
+        logger.debug("Processing directory: {}", source)
+        async with self.list_semaphore:
+            directory_list = await self.client.list(source, get_info=True)
+        # One directory read instead of a stat per remote item, off the event loop for slow shares
+        existing = await asyncio.to_thread(self.local_names, destination)
+        files, present, directories = self.classify_entries(directory_list, existing)
+        # One manifest query per directory for everything that may already be synced
+        entries = {}
+        if directories or present:
+            entries = await self.in_manifest(
+                self.manifest_entries, [item[0] for item in directories] + [item[0] for item in present]
+            )
+        ignored = len(directory_list) - len(files) - len(present) - len(directories)
+        unchanged = 0
+        for item_path, name, etag in directories:
+            if etag and entries.get(item_path, (None,))[0] == etag:
+                logger.debug("Unchanged directory {}", item_path)
+                unchanged += 1
+                continue
+            logger.debug("Directory {}", item_path)
+            directory_destination = Path(destination, name)
+            if name not in existing:
+                logger.debug("Creating destination {}", directory_destination)
+                await aiofiles.os.mkdir(directory_destination)
+            self.start_listing(item_path, directory_destination, etag)
+        new_files = len(files)
+        if self.settings.webdav.bulk_min_files:
+            files = await self.bulk_download(source, destination, files)
+        bulk = new_files - len(files)
+        downloads = [(item_path, name, etag, 0) for item_path, name, etag, size in files]
+        if present:
+            downloads.extend(await self.check_present(destination, present, entries))
+        skipped = len(present) - (len(downloads) - len(files))
+        for item_path, name, etag, offset in downloads:
+            file_destination = Path(destination, name)
+            logger.debug("Queueing download {}", file_destination)
+            await self.queue.put((item_path, str(file_destination), etag, offset))
+        # One line per directory, the per-entry detail is only logged at debug level
+        logger.info(
+            f"{source}: queued {len(downloads)}, bulk {bulk}, skipped {skipped}, ignored {ignored}, "
+            f"subdirectories {len(directories) - unchanged}, unchanged {unchanged}"
+        )
+
+    @staticmethod
+    def local_names(destination: Path) -> set[str]:
+        with os.scandir(destination) as entries:
+            return {entry.name for entry in entries}
+
+    @staticmethod
+    def local_stats(destination: Path, names: list[str]) -> dict[str, os.stat_result]:
+        return {name: os.stat(Path(destination, name)) for name in names}
+
+    async def check_present(
+        self,
+        destination: Path,
+        present: list[tuple[str, str, Optional[str], int]],
+        entries: dict[str, tuple[Optional[str], Optional[int]]],
+    ) -> list[tuple[str, str, Optional[str], int]]:
+        """Work out which files already on disk still need fetching, as (path, name, etag, offset)."""
+        downloads = []
+        unknown = []
+        for item_path, name, etag, size in present:
+            entry = entries.get(item_path)
+            if entry is not None and entry[1] is not None:
+                if entry[0] == etag:
+                    logger.debug("File exists:  {}", item_path)
                 else:
-                    file_destination = Path(destination, item_path.name)
-                    if file_destination.exists():
-                        logger.info(f"File exists:  {file_destination}")
-                    else:
-                        logger.info(f"Queueing download {file_destination}")
-                        self.queue.put_nowait((item["path"], str(file_destination)))
+                    logger.debug("File changed: {}", item_path)
+                    downloads.append((item_path, name, etag, 0))
             else:
-                logger.info(f"ignoring item {item["path"]}")
-        await asyncio.gather(*work_items)
+                # Cut short by a previous run, or from before the manifest existed
+                unknown.append((item_path, name, etag, size, entry[0] if entry else None))
+        if not unknown:
+            return downloads
+        stats = await asyncio.to_thread(self.local_stats, destination, [name for _, name, _, _, _ in unknown])
+        complete = []
+        for item_path, name, etag, size, started_etag in unknown:
+            local_size = stats[name].st_size
+            if local_size == size and (started_etag is None or started_etag == etag):
+                logger.debug("File exists:  {}", item_path)
+                complete.append((item_path, etag, int(stats[name].st_mtime), local_size))
+            elif etag and started_etag == etag and 0 < local_size < size:
+                downloads.append((item_path, name, etag, local_size))
+            else:
+                # The partial bytes may belong to an older version, start again
+                downloads.append((item_path, name, etag, 0))
+        if complete:
+            await self.in_manifest(self.store_downloads, complete)
+        return downloads
 
+    def classify_entries(
+        self, directory_list: list[dict[str, Any]], existing: set[str]
+    ) -> tuple[
+        list[tuple[str, str, Optional[str], int]],
+        list[tuple[str, str, Optional[str], int]],
+        list[tuple[str, str, Optional[str]]],
+    ]:
+        """Split a listing into new files and files already on disk, as (path, name, etag, size), and subdirectories, as (path, name, etag)."""
+        files = []
+        present = []
+        directories = []
+        item_filtered = self.item_filtered
+        for item in directory_list:
+            # WebDAV hands back normalised paths, so split the name off the string directly
+            item_path = item["path"].rstrip("/")
+            name = item_path.rsplit("/", 1)[-1]
+            if not item_filtered(item, name.lower()):
+                logger.debug("ignoring item {}", item["path"])
+            elif item["isdir"]:
+                directories.append((item_path, name, item.get("etag")))
+            elif name in existing:
+                present.append((item["path"], name, item.get("etag"), int(item.get("size") or 0)))
+            else:
+                files.append((item["path"], name, item.get("etag"), int(item.get("size") or 0)))
+        return files, present, directories
 
-    async def log_awaitable_finish(self, download: Awaitable, log_line: str):
-        await download
-        logger.debug(log_line)
+    async def bulk_download(
+        self, source: str, destination: Path, files: list[tuple[str, str, Optional[str], int]]
+    ) -> list[tuple[str, str, Optional[str], int]]:
+        """Fetch a directory's small files as one Nextcloud zip, returning the files still to download."""
+        small = {name: (item_path, etag) for item_path, name, etag, size in files if size <= self.settings.webdav.bulk_max_file_size}
+        # Nextcloud sends a single file as-is rather than zipped
+        if len(small) < max(self.settings.webdav.bulk_min_files, 2):
+            return files
+        url = f"{self.settings.webdav.host.rstrip('/')}/index.php/apps/files/ajax/download.php"
+        params = {"dir": source.removeprefix(str(self.prefix)) or "/", "files": json.dumps(list(small))}
+        extracted = set()
+        logger.info(f"Bulk downloading {len(small)} files into {destination}")
+        try:
+            with TemporaryFile() as archive:
+                async with self.session.get(url, params=params) as response:
+                    response.raise_for_status()
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        await asyncio.to_thread(archive.write, chunk)
+                extracted = await asyncio.to_thread(self.extract_archive, archive, destination, set(small))
+        except (aiohttp.ClientError, zipfile.BadZipFile, TimeoutError, OSError) as e:
+            # A full disk stops the run as it would for single files, anything else falls back to them
+            if isinstance(e, OSError) and e.errno == errno.ENOSPC:
+                raise
+            logger.warning(f"Bulk download of {source} failed, falling back to single files: {e}")
+        for name in extracted:
+            item_path, etag = small[name]
+            await self.record_download(item_path, str(Path(destination, name)), etag)
+        return [file for file in files if file[1] not in extracted]
 
-    @logger.catch
-    def item_filtered(self, item: dict[str, str], item_path: PurePosixPath) -> bool:
-        file_name =item_path.name.lower()
-        if item['isdir']:
-            if file_name in self.settings.filters.ignore_folders:
-                return False
-        else:
-            if file_name in self.settings.filters.ignore_files:
-                return False
-            elif any(fn in file_name for fn in self.settings.filters.ignore_files_contains):
-                return False
-        return True
+    @staticmethod
+    def extract_archive(archive: Any, destination: Path, names: set[str]) -> set[str]:
+        # Only take the requested names, flattened, so nothing in the zip can write outside destination
+        extracted = set()
+        archive.seek(0)
+        with zipfile.ZipFile(archive) as zip_file:
+            for info in zip_file.infolist():
+                name = PurePosixPath(info.filename).name
+                if info.is_dir() or name not in names or name in extracted:
+                    continue
+                with zip_file.open(info) as src, open(Path(destination, name), "wb") as dst:
+                    shutil.copyfileobj(src, dst, DOWNLOAD_CHUNK_SIZE)
+                extracted.add(name)
+        return extracted
+
+    def start_listing(self, source: str, destination: Path, etag: Optional[str] = None) -> None:
+        self.listing_tasks.append(self.task_group.create_task(self.process_directory(source, destination, etag)))
+
+    def item_filtered(self, item: dict[str, str], name_lower: str) -> bool:
+        return self.name_allowed(name_lower, item['isdir'])
+
+    def name_allowed(self, name: str, isdir: bool) -> bool:
+        if isdir:
+            return not self.filters.ignores_folder(name)
+        return not self.filters.ignores_file(name)
 
 
 if __name__ == "__main__":
@@ -143,4 +562,10 @@ if __name__ == "__main__":
         exit(1)
     print(config.model_dump())
     downloader = NextcloudDownloader(config)
-    asyncio.run(downloader.run())
\ No newline at end of file
+    # uvloop is an optional speed-up for the socket-heavy work, the stock loop is used without it
+    try:
+        import uvloop
+        loop_factory = uvloop.new_event_loop
+    except ImportError:
+        loop_factory = None
+    asyncio.run(downloader.run(), loop_factory=loop_factory)
\ No newline at end of file